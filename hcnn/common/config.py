@@ -1,5 +1,6 @@
 import anyconfig
 import logging
+import os
 import yaml
 
 logger = logging.getLogger(__name__)
@@ -48,5 +49,9 @@ class Config(object):
         return bool(self.data)
 
     def save(self, path):
-        with open(path, 'w') as fh:
+        # Write to a temporary file and move it into place, so processes
+        # saving the same config at once can't interleave their writes.
+        tmp_path = "{}.{}.tmp".format(path, os.getpid())
+        with open(tmp_path, 'w') as fh:
             yaml.dump(self.data, fh, default_flow_style=False)
+        os.replace(tmp_path, path)
@@ -1,3 +1,4 @@
+import functools
 import json
 import os
 
@@ -23,24 +24,39 @@ class InstrumentClassMap(object):
 
         # Create the reverse map so we can efficiently do the
         # reverse lookup
-        self.reverse_map = {}
-        for classname in self.data:
-            for item in self.data[classname]:
-                self.reverse_map[item] = classname
-
-        self.index_map = {}
-        for i, classname in enumerate(sorted(self.data.keys())):
-            self.index_map[classname] = i
+        self.reverse_map = {item: classname
+                            for classname, items in self.data.items()
+                            for item in items}
+
+        # The maps don't change after construction, so sort them once
+        # here instead of on every lookup. Tuples, since one instance is
+        # shared by everything that calls get_class_map.
+        self._sorted_classnames = tuple(sorted(self.data.keys()))
+        self._sorted_allnames = tuple(sorted(self.reverse_map.keys()))
+        self._allnames_set = frozenset(self._sorted_allnames)
+        self._size = len(self.data)
+
+        self.index_map = {classname: i for i, classname
+                          in enumerate(self._sorted_classnames)}
+
+        # Map every name straight to its class index, so get_index
+        # doesn't have to go through the reverse map first.
+        self._direct_index = {k: self.index_map[v]
+                              for k, v in self.reverse_map.items()}
 
     @property
     def allnames(self):
         """Return a complete list of all class names for searching the
         dataframe."""
-        return sorted(self.reverse_map.keys())
+        return list(self._sorted_allnames)
 
     @property
     def classnames(self):
-        return sorted(self.data.keys())
+        return list(self._sorted_classnames)
+
+    def __contains__(self, searchkey):
+        """Check if searchkey is any of the names in allnames."""
+        return searchkey in self._allnames_set
 
     def __getitem__(self, searchkey):
         """Get the actual class name. (Actually the reverse map)."""
@@ -59,15 +75,31 @@ class InstrumentClassMap(object):
         -------
         index : int
         """
-        return self.index_map[self[searchkey]]
+        return self._direct_index[searchkey]
 
     def from_index(self, index):
         """Get the instrument name for an index."""
-        return sorted(self.data.keys())[index]
+        return self._sorted_classnames[index]
 
     @property
     def size(self):
         """Return the size of the index map (the number of
         data keys)
         """
-        return len(self.data.keys())
+        return self._size
+
+
+@functools.lru_cache(maxsize=None)
+def get_class_map(file_path=CLASS_MAP):
+    """Return a shared InstrumentClassMap for file_path, so the class map
+    json is only read and parsed once per process.
+
+    Parameters
+    ----------
+    file_path : str
+
+    Returns
+    -------
+    classmap : InstrumentClassMap
+    """
+    return InstrumentClassMap(file_path)
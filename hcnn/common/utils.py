@@ -1,4 +1,5 @@
 import claudio
+import concurrent.futures
 import datetime
 import logging
 import logging.config
@@ -7,6 +8,7 @@ import os
 import pandas as pd
 import shutil
 import re
+import threading
 import wave
 import zipfile
 
@@ -24,6 +26,8 @@ COLOR_MAP = {
 
 logger = logging.getLogger(__name__)
 
+PARAMS_ITER_RE = re.compile(r"\d+|final")
+
 
 def create_directory(dname, recreate=False):
     """Create the output directory recursively if it doesn't already exist.
@@ -98,32 +102,58 @@ def map_io(input_file, output_directory):
                         "{}.npz".format(filebase(input_file)))
 
 
-def unzip_files(file_list):
+def unzip_one(zip_path):
+    """Unzip a file in place, into a folder with the same name as the zip.
+
+    Skips it if the extracted folder exists.
+
+    Parameters
+    ----------
+    zip_path : str
+
+    Returns
+    -------
+    new_folder_path : str or None
+        The created output folder, or None if it was skipped.
+    """
+    working_dir = os.path.dirname(zip_path)
+    zip_name = os.path.splitext(os.path.basename(zip_path))[0]
+    new_folder_path = os.path.join(working_dir, zip_name)
+    if os.path.exists(new_folder_path):
+        return None
+
+    with zipfile.ZipFile(zip_path, 'r') as myzip:
+        # Create a directory of the same name as the zip.
+        os.makedirs(new_folder_path)
+        myzip.extractall(path=new_folder_path)
+    return new_folder_path
+
+
+def unzip_files(file_list, max_workers=None):
     """Given a list of file paths, unzip them in place.
 
-    Attempts to skip it if the extracted folder exists.
+    Attempts to skip it if the extracted folder exists. Extraction is
+    mostly I/O, so the archives are extracted concurrently.
 
     Parameters
     ----------
     file_list : list of str
 
+    max_workers : int or None
+        Number of threads to use; if None, twice the number of CPUs.
+
     Returns
     -------
     List of created output folders.
     """
-    result_list = []
-    for zip_path in file_list:
-        working_dir = os.path.dirname(zip_path)
-        zip_name = os.path.splitext(os.path.basename(zip_path))[0]
-        new_folder_path = os.path.join(working_dir, zip_name)
-        if not os.path.exists(new_folder_path):
-            with zipfile.ZipFile(zip_path, 'r') as myzip:
-                # Create a directory of the same name as the zip.
-                os.makedirs(new_folder_path)
-                myzip.extractall(path=new_folder_path)
-                result_list.append(new_folder_path)
+    if max_workers is None:
+        max_workers = (os.cpu_count() or 1) * 2
+
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers) as executor:
+        result_list = list(executor.map(unzip_one, file_list))
 
-    return result_list
+    return [x for x in result_list if x is not None]
 
 
 def slice_ndarray(x_in, idx, length, axis=0):
@@ -184,7 +214,7 @@ def iter_from_params_filepath(params_filepath):
     iter_name : str
     """
     basename = os.path.basename(params_filepath)
-    return re.search('\d+|final', basename).group(0)
+    return PARAMS_ITER_RE.search(basename).group(0)
 
 
 class TimerHolder(object):
@@ -300,7 +330,9 @@ def filter_df(unfiltered_df, instrument=None, datasets=[]):
     """Return a view of the features_df looking at only
     the instrument and datasets specified.
     """
-    new_df = unfiltered_df.copy()
+    # Boolean indexing already returns a new frame, so only copy
+    # if nothing gets filtered.
+    new_df = unfiltered_df
 
     if instrument:
         new_df = new_df[new_df["instrument"] == instrument]
@@ -308,6 +340,8 @@ def filter_df(unfiltered_df, instrument=None, datasets=[]):
     if datasets:
         new_df = new_df[new_df["dataset"].isin(datasets)]
 
+    if new_df is unfiltered_df:
+        new_df = new_df.copy()
     return new_df
 
 
@@ -372,29 +406,43 @@ def same_shape_noise(original_signal, scale=1, rng=None):
 
 
 class SliceLogger(object):
+    """Counts what the slicers do with each record.
+
+    The slicers may run in a background thread (see
+    streams.prefetch_stream) while the training loop saves the log, so
+    every access to it holds a lock.
+    """
     def __init__(self):
         self.log = pd.DataFrame(columns=["target", "n_samples",
                                          "n_opened", "n_closed",
                                          "n_errors"])
+        self._lock = threading.Lock()
 
     def start(self, record, target):
         key = record['cqt']
-        if key not in self.log:
-            self.log.loc[key] = [target, 0, 1, 0, 0]
-        else:
-            self.log.loc[key, 'n_opened'] += 1
+        with self._lock:
+            if key not in self.log:
+                self.log.loc[key] = [target, 0, 1, 0, 0]
+            else:
+                self.log.loc[key, 'n_opened'] += 1
 
     def error(self, record):
         key = record['cqt']
-        self.log.loc[key, 'n_errors'] += 1
+        with self._lock:
+            self.log.loc[key, 'n_errors'] += 1
 
     def sample(self, record):
         key = record['cqt']
-        self.log.loc[key, 'n_samples'] += 1
+        with self._lock:
+            self.log.loc[key, 'n_samples'] += 1
 
     def close(self, record):
         key = record['cqt']
-        self.log.loc[key, 'n_closed'] += 1
+        with self._lock:
+            self.log.loc[key, 'n_closed'] += 1
 
     def save(self, path):
-        self.log.to_csv(path)
+        # Write out a snapshot, so the slicers aren't held up on the disk.
+        with self._lock:
+            log = self.log.copy()
+        log.to_csv(path)
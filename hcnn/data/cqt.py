@@ -16,6 +16,9 @@ from __future__ import print_function
 
 import argparse
 import claudio
+import contextlib
+import functools
+import inspect
 from joblib import delayed
 from joblib import Parallel
 import json
@@ -42,10 +45,102 @@ HARMONIC_PARAMS = dict(n_bins=CQT_PARAMS['n_bins'], n_harmonics=3,
 
 AUDIO_PARAMS = dict(samplerate=22050.0, channels=1, bytedepth=2)
 
+# The stored magnitudes get log-compressed before use, so half precision
+# is plenty, and halves the size of the feature files.
+FEATURE_DTYPE = np.float16
+
+
+def memoize_filters(constant_q):
+    """Wrap librosa's constant-Q filterbank constructor so each filterbank
+    is only built once per process.
+
+    librosa.cqt rebuilds the filters for every octave of every call, though
+    they only depend on the CQT parameters, which are the same for every
+    file we process.
+
+    Parameters
+    ----------
+    constant_q : function
+        librosa.filters.constant_q
+
+    Returns
+    -------
+    cached_constant_q : function
+        Drop-in replacement for constant_q.
+    """
+    cached = functools.lru_cache(maxsize=None)(constant_q)
+
+    @functools.wraps(constant_q)
+    def cached_constant_q(*args, **kwargs):
+        try:
+            hash((args, tuple(sorted(kwargs.items()))))
+        except TypeError:
+            # Unhashable parameters; just build them.
+            return constant_q(*args, **kwargs)
+        filters, lengths = cached(*args, **kwargs)
+        # librosa rescales the filters in place, so hand out copies.
+        return filters.copy(), lengths.copy()
+
+    cached_constant_q.cache_info = cached.cache_info
+    return cached_constant_q
+
+
+_cached_constant_q = memoize_filters(librosa.filters.constant_q)
+
+
+@contextlib.contextmanager
+def cached_filters():
+    """Have librosa.cqt build its filters through the memoized
+    constant_q, only within this block.
+
+    librosa.cqt looks the filters up through librosa.filters at call time;
+    the original function is put back on the way out, so nothing outside
+    of this module sees the cache.
+    """
+    original = librosa.filters.constant_q
+    librosa.filters.constant_q = _cached_constant_q
+    try:
+        yield
+    finally:
+        librosa.filters.constant_q = original
+
+
+def _cqt_channels(x_in, dtype=np.complex64, **kwargs):
+    """Compute librosa.cqt over each channel of a signal, writing them
+    into one preallocated array instead of stacking a list of them.
+
+    Parameters
+    ----------
+    x_in : np.ndarray, ndim=2
+        Input signal, with shape (time, channels)
+
+    dtype : np.dtype, default=np.complex64
+        Data type of the output; complex64 is plenty for the magnitudes
+        we keep, and half the size of librosa's complex128.
+
+    kwargs
+        Passed to librosa.cqt.
+
+    Returns
+    -------
+    cqt_spectra : np.ndarray, ndim=3
+        CQT of each channel, with shape (channels, time, frequency).
+    """
+    cqt_spectra = None
+    with cached_filters():
+        for c, x_c in enumerate(x_in.T):
+            spectra = librosa.cqt(x_c, **kwargs).T
+            if cqt_spectra is None:
+                cqt_spectra = np.empty((x_in.shape[1],) + spectra.shape,
+                                       dtype=dtype)
+            cqt_spectra[c] = spectra
+    return cqt_spectra
+
 
 def harmonic_cqt(x_in, sr, hop_length=1024, fmin=27.5, n_bins=72,
                  n_harmonics=5, bins_per_octave=36, tuning=0.0, filter_scale=1,
-                 aggregate=None, norm=1, sparsity=0.0, real=False):
+                 aggregate=None, norm=1, sparsity=0.0, real=False,
+                 fundamental=None):
     """Harmonically layered CQT.
 
     Thin wrapper around librosa.cqt; all parameters are the same, except for
@@ -59,6 +154,11 @@ def harmonic_cqt(x_in, sr, hop_length=1024, fmin=27.5, n_bins=72,
     n_harmonics : int, default=5
         Number of harmonic layers for each fundamental frequency.
 
+    fundamental : np.ndarray, ndim=3, default=None
+        A precomputed CQT with these same parameters, with shape
+        (channels, time, frequency). If given, it is used as the first
+        harmonic layer instead of computing it again.
+
     Returns
     -------
     harmonic_spectra : np.ndarray, ndim=4
@@ -73,16 +173,27 @@ def harmonic_cqt(x_in, sr, hop_length=1024, fmin=27.5, n_bins=72,
     cqt_spectra = []
     min_tdim = np.inf
     for i in range(1, n_harmonics + 1):
-        cqt_spectra += [np.array([librosa.cqt(x_c, fmin=i * fmin, **kwargs).T
-                                  for x_c in x_in.T])[:, np.newaxis, ...]]
+        if i == 1 and fundamental is not None:
+            cqt_spectra += [fundamental[:, np.newaxis, ...]]
+        else:
+            cqt_spectra += [_cqt_channels(
+                x_in, fmin=i * fmin, **kwargs)[:, np.newaxis, ...]]
         min_tdim = min([cqt_spectra[-1].shape[2], min_tdim])
     cqt_spectra = [x[:, :, :min_tdim, :] for x in cqt_spectra]
 
     return np.concatenate(cqt_spectra, axis=1)
 
 
+# The CQT parameters harmonic_cqt uses when not given, for its first layer.
+_HARMONIC_CQT_DEFAULTS = {
+    name: param.default
+    for name, param in inspect.signature(harmonic_cqt).parameters.items()
+    if param.default is not inspect.Parameter.empty and
+    name not in ('n_harmonics', 'fundamental')}
+
+
 def cqt_one(input_file, output_file, cqt_params=None, audio_params=None,
-            harmonic_params=None, skip_existing=True):
+            harmonic_params=None, skip_existing=True, dtype=FEATURE_DTYPE):
     """Compute the CQT for a input/output file Pair.
 
     Parameters
@@ -106,6 +217,9 @@ def cqt_one(input_file, output_file, cqt_params=None, audio_params=None,
     skip_existing : bool, default=True
         Skip outputs that exist.
 
+    dtype : np.dtype or str, default=FEATURE_DTYPE
+        Data type to store the CQT magnitudes with.
+
     Returns
     -------
     success : bool
@@ -143,11 +257,20 @@ def cqt_one(input_file, output_file, cqt_params=None, audio_params=None,
             return False
         logger.debug("[{0}] Computing features {1}".format(
             time.asctime(), input_file))
-        cqt_spectra = np.array([np.abs(librosa.cqt(x_c, sr=fs, **cqt_params).T)
-                                for x_c in x.T])
+        cqt_spectra = _cqt_channels(x, sr=fs, **cqt_params)
+        plain_params = cqt_params.copy()
 
+        # If the first harmonic is exactly the CQT we just computed, don't
+        # compute it twice. harmonic_cqt fills in its own defaults for
+        # anything not given, which needn't match librosa's.
         cqt_params.update(**harmonic_params)
-        harm_spectra = harmonic_cqt(x, fs, **cqt_params)
+        fundamental_params = {
+            k: cqt_params.get(k, default)
+            for k, default in _HARMONIC_CQT_DEFAULTS.items()}
+        same_fundamental = fundamental_params == plain_params
+        harm_spectra = harmonic_cqt(
+            x, fs, fundamental=cqt_spectra if same_fundamental else None,
+            **cqt_params)
 
         frame_idx = np.arange(cqt_spectra.shape[1])
         time_points = librosa.frames_to_time(
@@ -155,8 +278,8 @@ def cqt_one(input_file, output_file, cqt_params=None, audio_params=None,
         logger.debug("[{0}] Saving: {1}".format(time.asctime(), output_file))
         np.savez(
             output_file, time_points=time_points,
-            cqt=np.abs(cqt_spectra).astype(np.float32),
-            harmonic_cqt=np.abs(harm_spectra).astype(np.float32))
+            cqt=np.abs(cqt_spectra).astype(dtype),
+            harmonic_cqt=np.abs(harm_spectra).astype(dtype))
     except AssertionError as e:
         logger.error("Failed to load audio file: {} with error:\n{}".format(
                      input_file, e))
@@ -166,7 +289,7 @@ def cqt_one(input_file, output_file, cqt_params=None, audio_params=None,
 
 def cqt_many(audio_files, output_files, cqt_params=None, audio_params=None,
              harmonic_params=None, num_cpus=-1, verbose=50,
-             skip_existing=True):
+             skip_existing=True, batch_size=8, dtype=FEATURE_DTYPE):
     """Compute CQT representation over a number of audio files.
 
     Parameters
@@ -189,23 +312,38 @@ def cqt_many(audio_files, output_files, cqt_params=None, audio_params=None,
     num_cpus : int, default=-1
         Number of parallel threads to use for computation.
 
+    verbose : int
+        Passed to "Parallel".
+
+    skip_existing : bool
+        If files exist, don't try to extract them.
+
+    batch_size : int or 'auto', default=8
+        Number of files sent to a worker at once. The files are short
+        notes, so batching them amortizes the dispatch overhead per file.
+
+    dtype : np.dtype or str, default=FEATURE_DTYPE
+        Data type to store the CQT magnitudes with.
+
     Returns
     -------
     failed_files : array of audio_files
         Array indicating which files failed to load.
     """
-    pool = Parallel(n_jobs=num_cpus, verbose=50)
+    pool = Parallel(n_jobs=num_cpus, verbose=verbose, batch_size=batch_size,
+                    pre_dispatch='2*n_jobs')
     dcqt = delayed(cqt_one)
     pairs = zip(audio_files, output_files)
     statuses = pool(dcqt(fin, fout, cqt_params, audio_params,
-                         harmonic_params, skip_existing)
+                         harmonic_params, skip_existing, dtype)
                     for fin, fout in pairs)
     return [audio_files[i] for i, x in enumerate(statuses) if not x]
 
 
 def cqt_from_dataset(dataset, write_dir,
                      cqt_params=None, audio_params=None, harmonic_params=None,
-                     num_cpus=-1, verbose=50, skip_existing=True):
+                     num_cpus=-1, verbose=50, skip_existing=True,
+                     dtype=FEATURE_DTYPE):
     """Compute CQT representation over audio files referenced by
     a dataframe, and return a new dataframe also containing a column
     referencing the cqt files.
@@ -236,6 +374,9 @@ def cqt_from_dataset(dataset, write_dir,
     skip_existing : bool
         If files exist, don't try to extract them.
 
+    dtype : np.dtype or str, default=FEATURE_DTYPE
+        Data type to store the CQT magnitudes with.
+
     Returns
     -------
     updated_dataset : data.dataset.Dataset
@@ -255,7 +396,8 @@ def cqt_from_dataset(dataset, write_dir,
     cqt_paths = [features_path_for_audio(x) for x in audio_paths]
 
     failed_files = cqt_many(audio_paths, cqt_paths, cqt_params, audio_params,
-                            harmonic_params, num_cpus, verbose, skip_existing)
+                            harmonic_params, num_cpus, verbose, skip_existing,
+                            dtype=dtype)
     logger.warning("{} files failed to extract.".format(len(failed_files)))
 
     feats_df = dataset.to_df()
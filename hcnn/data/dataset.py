@@ -27,20 +27,39 @@ class MissingDataException(Exception):
     pass
 
 
-def get_remote_schema(url=SCHEMA_PATH):
-    try:
-        return requests.get(url).json()
-    except requests.exceptions.ConnectionError:
-        logger.error("No internet connection - cannot load remote schema.")
-        return {}
+# Schemas fetched so far, by url.
+_REMOTE_SCHEMAS = {}
+
+
+def get_remote_schema(url=SCHEMA_PATH, timeout=10):
+    """Fetch the observation schema. Once fetched successfully, it isn't
+    fetched again in this process; failed fetches are retried."""
+    if url not in _REMOTE_SCHEMAS:
+        try:
+            _REMOTE_SCHEMAS[url] = requests.get(url, timeout=timeout).json()
+        except (requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout):
+            logger.error("No internet connection - cannot load remote "
+                         "schema.")
+            return {}
+
+    return _REMOTE_SCHEMAS[url]
 
 
 class Observation(object):
     """Document model each item in the collection.
     TODO: Inherit / whatever from minst-dataset repo
     """
+    # Fixed fields, so observations don't each carry an instance __dict__.
+    __slots__ = ('index', 'dataset', 'audio_file', 'instrument',
+                 'source_key', 'start_time', 'duration', 'note_number',
+                 'dynamic', 'partition', 'features')
+
     # SCHEMA = get_remote_schema()
     SCHEMA = {}
+    # (SCHEMA, validator for it); checked & compiled on first use, and
+    # again if SCHEMA gets replaced. Kept separately for each class.
+    _schema_validator = None
 
     def __init__(self, dataset, audio_file, instrument,
                  index=None, source_key=None,
@@ -79,10 +98,23 @@ class Observation(object):
                    partition=record.get('partition', ""))
 
     def to_dict(self):
-        return self.__dict__.copy()
+        return {key: getattr(self, key) for key in self.__slots__}
 
     def __getitem__(self, key):
-        return self.__dict__[key]
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def to_flat_dict(self):
+        """Convert to a flat dict (ie make features a key)
+
+        Returns
+        -------
+        dict
+        """
+        flat_dict = self.to_dict()
+        flat_dict.update(**flat_dict.pop("features"))
+        return flat_dict
 
     def to_series(self):
         """Convert to a flat series (ie make features a column)
@@ -91,18 +123,34 @@ class Observation(object):
         -------
         pd.Series
         """
-        flat_dict = self.to_dict()
-        flat_dict.update(**flat_dict.pop("features"))
-        return pd.Series(flat_dict)
+        return pd.Series(self.to_flat_dict())
+
+    @classmethod
+    def schema_validator(cls, schema=None):
+        """Return a jsonschema validator for schema, or for SCHEMA if
+        schema is None.
+
+        The SCHEMA validator is cached, so the schema isn't re-checked
+        for every observation. Subclasses get their own, and assigning a
+        new SCHEMA compiles a new one.
+        """
+        def compile_schema(schema):
+            validator_cls = jsonschema.validators.validator_for(schema)
+            validator_cls.check_schema(schema)
+            return validator_cls(schema)
+
+        if schema is not None and schema is not cls.SCHEMA:
+            return compile_schema(schema)
+
+        cached = cls.__dict__.get('_schema_validator')
+        if cached is None or cached[0] is not cls.SCHEMA:
+            cached = (cls.SCHEMA, compile_schema(cls.SCHEMA))
+            cls._schema_validator = cached
+        return cached[1]
 
     def validate(self, schema=None):
-        schema = self.SCHEMA if schema is None else schema
-        success = True
-        try:
-            jsonschema.validate(self.to_dict(), schema)
-        except jsonschema.ValidationError:
-            success = False
-        success &= os.path.exists(self.audio_file)
+        success = self.schema_validator(schema).is_valid(self.to_dict())
+        success = success and os.path.exists(self.audio_file)
         if success:
             success &= utils.check_audio_file(self.audio_file,
                                               min_duration=.1)[0]
@@ -114,10 +162,11 @@ def expand_audio_paths(df, data_root):
     # Update the paths to full paths, and make sure it's
     # saved in 'audio_file'
     new_df = df.copy()
-    for idx, item in new_df.iterrows():
-        assert 'audio_file' in item
-        new_df.loc[idx, 'audio_file'] = os.path.expanduser(
-            os.path.join(data_root, item['audio_file']))
+    assert 'audio_file' in new_df.columns
+    # Rewrite the whole column at once; setting it row by row with .loc
+    # is very slow.
+    new_df['audio_file'] = [os.path.expanduser(os.path.join(data_root, x))
+                            for x in new_df['audio_file']]
     return new_df
 
 
@@ -128,8 +177,10 @@ class Dataset(object):
 
     @classmethod
     def from_observations(cls, observations):
-        obs_series = [x.to_series() for x in observations]
-        return cls(pd.DataFrame(obs_series))
+        # Build the frame from plain records; going through a Series
+        # per observation is much slower.
+        return cls(pd.DataFrame.from_records(
+            [x.to_flat_dict() for x in observations]))
 
     @classmethod
     def load(cls, path, data_root=None):
@@ -218,7 +269,9 @@ class Dataset(object):
         """Return a copy of the dataset, filtering on dataset name
         or instrument
         """
-        result = self.df.copy()
+        # Boolean indexing already returns a new frame, so only copy
+        # if nothing gets filtered.
+        result = self.df
         if dataset_name:
             if invert:
                 result = result[result['dataset'] != dataset_name]
@@ -230,6 +283,8 @@ class Dataset(object):
             else:
                 result = result[result['instrument'] == instrument]
 
+        if result is self.df:
+            result = result.copy()
         return Dataset(result)
 
     def test_set(self, selected_set):
@@ -10,7 +10,7 @@
 """
 
 import boltons.fileutils
-import datetime
+import concurrent.futures
 import glob
 import json
 import logging
@@ -19,8 +19,10 @@ import os
 import pandas as pd
 import shutil
 import sklearn.metrics
+import time
 
 import hcnn.common.config as C
+import hcnn.common.labels
 import hcnn.common.utils as utils
 import hcnn.data.cqt
 import hcnn.data.dataset
@@ -55,6 +57,15 @@ def get_slicer_from_feature(feature_mode):
     return slicer
 
 
+def _fit_and_predict_fold(driver_kwargs, test_set):
+    """Run fit_and_predict_one for a single fold in a fresh Driver.
+
+    This lives at the module level so it can be sent to a worker process.
+    """
+    driver = Driver(**driver_kwargs)
+    return driver.fit_and_predict_one(test_set)
+
+
 class Driver(object):
     "Controller class for running experiments and holding state."
 
@@ -110,6 +121,8 @@ class Driver(object):
 
         load_features : bool
             If true, attempts to load the features files from the dataset.
+            The features are only extracted once something needs them;
+            see `features`.
         """
         if isinstance(config, str):
             self.config = C.Config.load(config)
@@ -128,31 +141,46 @@ class Driver(object):
             if partitions:
                 self.setup_partitions(partitions)
 
+    # The config doesn't change once the Driver is set up, so the
+    # values derived from it are computed once and kept.
     @property
     def selected_dataset(self):
-        return self.config['data/selected']
+        if not hasattr(self, "_selected_dataset"):
+            self._selected_dataset = self.config['data/selected']
+        return self._selected_dataset
 
     @property
     def dataset_config(self):
-        return self.config['data/{}'.format(self.selected_dataset)]
+        if not hasattr(self, "_dataset_config"):
+            self._dataset_config = self.config[
+                'data/{}'.format(self.selected_dataset)]
+        return self._dataset_config
 
     @property
     def dataset_index(self):
-        return self.dataset_config['notes_index']
+        if not hasattr(self, "_dataset_index"):
+            self._dataset_index = self.dataset_config['notes_index']
+        return self._dataset_index
 
     @property
     def data_root(self):
-        return self.dataset_config['root']
+        if not hasattr(self, "_data_root"):
+            self._data_root = self.dataset_config['root']
+        return self._data_root
 
     @property
     def feature_dir(self):
-        return os.path.expanduser(
-            self.config['paths/feature_dir'])
+        if not hasattr(self, "_feature_dir"):
+            self._feature_dir = os.path.expanduser(
+                self.config['paths/feature_dir'])
+        return self._feature_dir
 
     @property
     def features_path(self):
-        dataset_fn = os.path.basename(self.dataset_index)
-        return os.path.join(self.feature_dir, dataset_fn)
+        if not hasattr(self, "_features_path"):
+            dataset_fn = os.path.basename(self.dataset_index)
+            self._features_path = os.path.join(self.feature_dir, dataset_fn)
+        return self._features_path
 
     def _init(self, model_name):
         if model_name is not None:
@@ -169,6 +197,9 @@ class Driver(object):
             "training/max_files_per_class", None)
 
         self.dataset = None
+        self._features_pending = False
+        self._original_config = None
+        self._param_format_str = None
 
         if self.experiment_name:
             self._model_dir = os.path.join(
@@ -177,15 +208,6 @@ class Driver(object):
             self._experiment_config_path = os.path.join(
                 self._model_dir, self.config['experiment/config_path'])
 
-            # if these don't exist, we're not actually running anything
-            if self.model_definition and self.feature_mode:
-                utils.create_directory(self._model_dir)
-
-    @property
-    def param_format_str(self):
-        # Lazy instantiation for param_format_str
-        if not hasattr(self, "_param_format_str") or \
-                self._param_format_str is None:
             # set up the param formatter.
             max_iterations = self.config['training/max_iterations']
             params_zero_pad = int(np.ceil(np.log10(max_iterations)))
@@ -193,6 +215,25 @@ class Driver(object):
             # insert the zero padding into the format string.
             self._param_format_str = param_format_str.format(params_zero_pad)
 
+            # if these don't exist, we're not actually running anything
+            if self.model_definition and self.feature_mode:
+                utils.create_directory(self._model_dir)
+
+    @property
+    def original_config(self):
+        """The config saved in the experiment directory by train_model.
+
+        Loaded once, and reused until the experiment config is re-written.
+        """
+        if self._original_config is None:
+            self._original_config = C.Config.load(
+                self._experiment_config_path)
+
+        return self._original_config
+
+    @property
+    def param_format_str(self):
+        """Format string for the params files; set up in _init."""
         return self._param_format_str
 
     def _format_params_fn(self, model_iter):
@@ -215,7 +256,7 @@ class Driver(object):
         """Check to make sure everything's ready to run, including:
          * existing features
         """
-        if "cqt" not in self.dataset.to_df().columns:
+        if "cqt" not in self.features.to_df().columns:
             logger.error("No features for input data; please extract first.")
             return False
         return True
@@ -226,8 +267,9 @@ class Driver(object):
         Parameters
         ----------
         load_features : bool
-            If true, tries to load the features version of the dataset,
-            else just loads the original specified version.
+            If true, the features version of the dataset gets loaded
+            the first time `features` is accessed; else just loads the
+            original specified version.
         """
         # Always start by loading the dataset.
         if dataset:
@@ -247,10 +289,23 @@ class Driver(object):
 
         assert len(self.dataset) > 0
 
-        # If we want the features, additionally add it to the dataset.
-        if load_features:
+        # If we want the features, additionally add them to the dataset
+        # when they're first needed.
+        self._features_pending = load_features
+
+    @property
+    def features(self):
+        """The dataset, with features.
+
+        Extracting the features is expensive, and not needed for everything
+        (e.g. print_stats), so it is deferred until the first access.
+        """
+        if self._features_pending:
             logger.info(utils.colored("load_dataset() - extracting features."))
             self.dataset = self.extract_features()
+            self._features_pending = False
+
+        return self.dataset
 
     def load_partition_df(self, test_partition):
         partition_file = self.dataset_config['partitions'][test_partition]
@@ -260,20 +315,22 @@ class Driver(object):
         """Given the partition, setup the sets."""
         # If the dataset we have selected has partitions
         if 'partitions' in self.dataset_config:
-            data_df = self.dataset.to_df()
+            data_df = self.features.to_df()
             self.partitions_df = self.load_partition_df(test_partition)
 
             # set the train_set, valid_set, test_set from the original dataset
-            # using the indexes from teh partition_file.
+            # using the indexes from teh partition_file, splitting the
+            # data with a single pass over the partition column.
+            partition = self.partitions_df['partition'].reindex(
+                data_df.index)
+            groups = dict(list(data_df.groupby(partition)))
+            empty_df = data_df.iloc[:0]
             self.train_set = hcnn.data.dataset.Dataset(
-                data_df.loc[(
-                    self.partitions_df['partition'] == 'train')])
+                groups.get('train', empty_df))
             self.valid_set = hcnn.data.dataset.Dataset(
-                data_df.loc[(
-                    self.partitions_df['partition'] == 'valid')])
+                groups.get('valid', empty_df))
             self.test_set = hcnn.data.dataset.Dataset(
-                data_df.loc[(
-                    self.partitions_df['partition'] == 'test')])
+                groups.get('test', empty_df))
 
             assert (len(self.train_set) + len(self.valid_set) +
                     len(self.test_set)) == len(self.dataset)
@@ -284,6 +341,7 @@ class Driver(object):
         self._init_cross_validation(test_partition)
 
     def _init_cross_validation(self, test_set):
+        self._original_config = None
         self._cv_model_dir = os.path.join(self._model_dir, test_set)
         self._params_dir = os.path.join(
             self._cv_model_dir,
@@ -303,36 +361,33 @@ class Driver(object):
         dataset_df = self.dataset.to_df()
         datasets = ["rwc", "uiowa", "philharmonia"]
 
-        def print_datasetcount(dataset):
-            print("{:<20} {:<30}".format(
-                "{} count".format(dataset),
-                len(dataset_df[dataset_df["dataset"] == dataset])))
-        for dataset in datasets:
-            print_datasetcount(dataset)
+        # Count everything in one pass, rather than filtering the
+        # dataframe for every (instrument, dataset) pair.
+        counts = dataset_df.groupby(["instrument", "dataset"]).size() \
+            .unstack(fill_value=0).reindex(columns=datasets, fill_value=0)
 
-        def print_dataset_instcount(df, instrument):
-            inst_filter = df[df["instrument"] == instrument]
-            print("{:<20} {:<30} {:<30} {:<30}".format(
-                "{} count".format(instrument),
-                len(inst_filter[inst_filter["dataset"] == "rwc"]),
-                len(inst_filter[inst_filter["dataset"] == "uiowa"]),
-                len(inst_filter[inst_filter["dataset"] == "philharmonia"])))
+        dataset_counts = counts.sum(axis=0)
+        for dataset in datasets:
+            print("{:<20} {:<30}".format(
+                "{} count".format(dataset), dataset_counts[dataset]))
 
-        classmap = hcnn.common.labels.InstrumentClassMap()
+        classmap = hcnn.common.labels.get_class_map()
 
         print("---------------------------")
         print("Datasets-Instrument count / dataset")
         print("---------------------------")
         print(utils.colored("{:<20} {:<30} {:<30} {:<30}".format(
             "item", "rwc", "uiowa", "philharmonia")))
-        for inst in sorted(dataset_df["instrument"].unique()):
-            if inst in classmap.allnames:
-                print_dataset_instcount(dataset_df, inst)
+        # groupby has already sorted the instruments, and the columns
+        # are in the order of `datasets`.
+        for inst, row in zip(counts.index, counts.values):
+            if inst in classmap:
+                print("{:<20} {:<30} {:<30} {:<30}".format(
+                    "{} count".format(inst), *row))
 
     @property
     def feature_ds_path(self):
-        return os.path.join(
-            self.feature_dir, os.path.basename(self.dataset_index))
+        return self.features_path
 
     def load_existing_features(self, as_dataset=True):
         if os.path.exists(self.feature_ds_path):
@@ -377,6 +432,7 @@ class Driver(object):
 
         # Save the config we used in the model directory, just in case.
         self.config.save(self._experiment_config_path)
+        self._original_config = None
 
         # Duration parameters
         max_iterations = self.config['training/max_iterations']
@@ -414,28 +470,32 @@ class Driver(object):
 
         timers = utils.TimerHolder()
         iter_count = 0
-        train_stats = pd.DataFrame(columns=['timestamp',
-                                            'batch_train_dur',
-                                            'iteration', 'loss'])
+        # Collect the per-iteration stats in a plain list; appending rows to
+        # a DataFrame reallocates it on every iteration.
+        train_stats_columns = ['timestamp', 'batch_train_dur',
+                               'iteration', 'loss']
+        train_log = []
         min_train_loss = np.inf
 
         timers.start("train")
         logger.info("[{}] Beginning training loop at {}".format(
             self.experiment_name, timers.get("train")))
+        # Check max_time against a monotonic clock, so it's cheap to test
+        # every iteration and unaffected by wall-clock changes.
+        deadline = time.monotonic() + max_time
         try:
             timers.start(("stream", iter_count))
-            for batch in streamer:
+            # Slice the next batches while the current one trains.
+            for batch in streams.prefetch_stream(streamer, n_batches=2):
                 timers.end(("stream", iter_count))
                 timers.start(("batch_train", iter_count))
                 loss = model.train(batch)
                 timers.end(("batch_train", iter_count))
-                row = dict(timestamp=timers.get_end(
-                            ("batch_train", iter_count)),
-                           batch_train_dur=timers.get(
-                            ("batch_train", iter_count)),
-                           iteration=iter_count,
-                           loss=loss)
-                train_stats.loc[len(train_stats)] = row
+                train_log.append((
+                    timers.get_end(("batch_train", iter_count)),
+                    timers.get(("batch_train", iter_count)),
+                    iter_count,
+                    loss))
 
                 # Time Logging
                 logger.debug("[Iter timing] iter: {} | loss: {} | "
@@ -445,8 +505,8 @@ class Driver(object):
                                 timers.get(("batch_train", iter_count))))
                 # Print status
                 if iter_print_freq and (iter_count % iter_print_freq == 0):
-                    mean_train_loss = \
-                        train_stats["loss"][-iter_print_freq:].mean()
+                    mean_train_loss = np.mean(
+                        [x[-1] for x in train_log[-iter_print_freq:]])
                     output_str = ("Iteration: {} | Mean_Train_loss: {}"
                                   .format(iter_count,
                                           utils.conditional_colored(
@@ -493,9 +553,7 @@ class Driver(object):
                                              "slice_log.csv")
                     slice_logger.save(slice_log)
 
-                if datetime.datetime.now() > \
-                        (timers.get("train") + datetime.timedelta(
-                            seconds=max_time)):
+                if time.monotonic() > deadline:
                     raise EarlyStoppingException("Max Time reached")
 
                 iter_count += 1
@@ -512,6 +570,7 @@ class Driver(object):
                 utils.colored("Training Stopped for {}".format(e), "red"))
             print("Training halted for: ", e)
         timers.end("train")
+        train_stats = pd.DataFrame(train_log, columns=train_stats_columns)
 
         # Print final training loss
         logger.info("Total iterations: {}".format(iter_count))
@@ -568,7 +627,7 @@ class Driver(object):
         validation_df = self.valid_set.to_df()
 
         # load all necessary config parameters from the ORIGINAL config
-        original_config = C.Config.load(self._experiment_config_path)
+        original_config = self.original_config
         validation_error_file = os.path.join(
             self._cv_model_dir, original_config['experiment/validation_loss'])
 
@@ -612,7 +671,10 @@ class Driver(object):
         best_model : int
             The iteration number which produced the best model.
         """
-        best = model_selection_df.loc[model_selection_df["mean_acc"].argmax()]
+        # Positional argmax; Series.argmax is not a label, so it can't
+        # be passed to .loc.
+        best = model_selection_df.iloc[
+            model_selection_df["mean_acc"].values.argmax()]
         return best["model_iteration"]
 
     def predict(self, model_iter):
@@ -631,7 +693,7 @@ class Driver(object):
             utils.colored(model_iter, "cyan")))
         selected_param_file = self._format_params_fn(model_iter)
 
-        original_config = C.Config.load(self._experiment_config_path)
+        original_config = self.original_config
         params_file = os.path.join(self._params_dir,
                                    selected_param_file)
         slicer = get_slicer_from_feature(self.feature_mode)
@@ -639,9 +701,10 @@ class Driver(object):
         logger.info("Deserializing Network & Params...")
         model = models.NetworkManager.deserialize_npz(params_file)
 
-        dataset_df = self.dataset.to_df()
-        logger.debug("Predicting across {} files.".format(
-            len(dataset_df['cqt'].nonzero()[0])))
+        dataset_df = self.features.to_df()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Predicting across {} files.".format(
+                int(dataset_df['cqt'].astype(bool).sum())))
 
         predictions_df_path = self._format_predictions_fn(model_iter)
 
@@ -654,7 +717,7 @@ class Driver(object):
 
     def analyze_from_predictions(self, model_iter, test_set):
         """Loads predictions from a file before calling analyze."""
-        original_config = C.Config.load(self._experiment_config_path)
+        original_config = self.original_config
         analyzer = hcnn.evaluate.analyze.PredictionAnalyzer.from_config(
             original_config, self.experiment_name, model_iter, test_set)
 
@@ -727,26 +790,54 @@ class Driver(object):
                     .format(test_set, result))
         return result
 
-    def fit_and_predict_cross_validation(self, skip_training=False):
+    def fit_and_predict_cross_validation(self, skip_training=False,
+                                         max_workers=1):
         """Master loop for running cross validation across
         all datasets.
 
+        With max_workers > 1, each fold runs in its own process with its
+        own Driver. Each fold trains under its own directory, but they
+        all save the same experiment config. Only use this when training
+        on the CPU: the workers are forked after theano is imported, so
+        they can't use a CUDA context, and would share the one GPU anyway.
+
         Parameters
         ----------
         skip_training : boolean
             For situations where you need to re-run model selection
             and prediction, skip up to model selection.
 
+        max_workers : int, default=1
+            Number of folds to run at once. If 1, the folds are run
+            one after the other in this process.
+
         Returns
         -------
         success : bool
             True if succeeded end-to-end, False if anything failed.
         """
         logger.info("Beginning fit_and_predict_cross_validation")
-        results = []
-        for test_set in ["rwc", "uiowa", "philharmonia"]:
-            results.append(self.fit_and_predict_one(test_set,
-                                                    skip_training=False))
+        test_sets = ["rwc", "uiowa", "philharmonia"]
+        if max_workers == 1:
+            results = [self.fit_and_predict_one(test_set,
+                                                skip_training=False)
+                       for test_set in test_sets]
+        else:
+            # Extract the features once here, so the folds don't all
+            # try to write the same feature files.
+            driver_kwargs = dict(config=self.config,
+                                 model_name=self.model_definition,
+                                 experiment_name=self.experiment_name,
+                                 dataset=self.features,
+                                 load_features=False,
+                                 skip_features=self.skip_features,
+                                 skip_training=self.skip_training,
+                                 skip_cleaning=self.skip_cleaning)
+            with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=max_workers) as executor:
+                results = list(executor.map(
+                    _fit_and_predict_fold,
+                    [driver_kwargs] * len(test_sets), test_sets))
         final_result = all(results)
         logger.info("Completed fit_and_predict_cross_validation. Result={}"
                     .format(final_result))
@@ -813,9 +904,8 @@ class Driver(object):
                 pred_destination = os.path.join(destination_dir,
                                                 os.path.basename(prediction_file))
                 prediction_df = pd.read_pickle(prediction_file).dropna()
-                prediction_df = pd.DataFrame([
-                    x for index, x in prediction_df.iterrows()
-                    if dataset in index])
+                prediction_df = prediction_df[
+                    prediction_df.index.str.contains(dataset, regex=False)]
                 # To make this easy, we drop the nan's here.
                 # Possibly this is going to bit me later.
 
@@ -1,4 +1,5 @@
 import copy
+import functools
 import logging
 import numpy as np
 import os
@@ -10,6 +11,74 @@ logger = logging.getLogger(__name__)
 DATASETS = ["rwc", "uiowa", "philharmonia"]
 
 
+@functools.lru_cache(maxsize=4)
+def _load_datasets(features_path, mtime):
+    """Load the dataset column of a features dataframe.
+
+    Cached on the path and its modification time, so repeated analyzers
+    over the same features only unpickle it once, but a rewritten file
+    gets read again.
+    """
+    # Only the dataset column gets joined onto the predictions; don't
+    # hold on to the rest of the features frame.
+    return pandas.read_pickle(features_path)[["dataset"]]
+
+
+def _label_indices(values, labels):
+    """Find where each value sits in a sorted list of labels.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Class labels to look up.
+
+    labels : np.ndarray, sorted
+        Classes to look them up in; must not be empty.
+
+    Returns
+    -------
+    indices : np.ndarray
+        Position of each value in labels.
+
+    known : np.ndarray, dtype=bool
+        Whether each value is in labels at all; indices is meaningless
+        where it isn't.
+    """
+    indices = np.searchsorted(labels, values).clip(0, len(labels) - 1)
+    return indices, labels[indices] == values
+
+
+def _confusion_matrix(y_true, y_pred, labels):
+    """Count the (target, prediction) pairs in a single bincount; the same
+    as sklearn.metrics.confusion_matrix(y_true, y_pred, labels=labels).
+
+    Parameters
+    ----------
+    y_true, y_pred : np.ndarray
+        Target and predicted classes.
+
+    labels : list, sorted
+        Classes to index the matrix by; pairs with either class not in
+        labels are not counted.
+
+    Returns
+    -------
+    confusion_matrix : np.ndarray, shape=(len(labels), len(labels))
+        Count of targets (rows) predicted as each class (columns).
+    """
+    labels = np.asarray(labels)
+    n_labels = len(labels)
+    if not n_labels:
+        return np.zeros((0, 0), dtype=np.intp)
+
+    true_idx, true_known = _label_indices(y_true, labels)
+    pred_idx, pred_known = _label_indices(y_pred, labels)
+    known = true_known & pred_known
+    pairs = true_idx[known] * n_labels + pred_idx[known]
+    return np.bincount(pairs, minlength=n_labels * n_labels).reshape(
+        n_labels, n_labels)
+
+
 def concat_dataset_column(predictions_df, features_df):
     """Joins the features and predictions on the index, and
     concatenates the "dataset" field from features_df to the
@@ -20,10 +89,31 @@ def concat_dataset_column(predictions_df, features_df):
     joined_predictions : pandas.DataFrame
         predictions_df including the dataset.
     """
-    return pandas.concat([
-        predictions_df,
-        features_df[features_df.index.isin(predictions_df.index)]['dataset']],
-        axis=1)
+    # Look the datasets up by the predictions' index; anything missing
+    # from features_df comes back NaN, as it would from an outer join.
+    datasets = features_df['dataset'].reindex(predictions_df.index)
+    return predictions_df.assign(dataset=datasets.values)
+
+
+def _as_labels(values):
+    """Narrow an array of class indices to int8 where they fit, so the
+    comparisons over them move an eighth of the memory of int64.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Class indices.
+
+    Returns
+    -------
+    labels : np.ndarray
+        values as int8 if they are all integers in [0, 128); otherwise
+        values unchanged.
+    """
+    if (values.dtype.kind in 'iu' and len(values) and
+            values.min() >= 0 and values.max() < 128):
+        return values.astype(np.int8, copy=False)
+    return values
 
 
 class PredictionAnalyzer(object):
@@ -62,10 +152,62 @@ class PredictionAnalyzer(object):
 
     def view(self, dataset):
         """Returns a copy of the analyzer pointing to the desired dataset."""
+        self._check_predictions_df("select a dataset")
         thecopy = copy.copy(self)
         thecopy.set_test_set(dataset)
         return thecopy
 
+    def _check_predictions_df(self, action):
+        """Raise a ValueError if this analyzer has no predictions_df to
+        `action` with, as when it was created with from_arrays."""
+        if self.predictions_df is None:
+            raise ValueError("Can't {} without the predictions_df."
+                             .format(action))
+
+    @classmethod
+    def from_arrays(cls, y_true, y_pred, mean_loss=None,
+                    confusion_matrix=None):
+        """Create an analyzer directly from arrays of targets and
+        predictions, without building a predictions dataframe.
+
+        Parameters
+        ----------
+        y_true, y_pred : array_like
+            Target and predicted class indeces.
+
+        mean_loss : float or None
+            Mean loss over the predictions, if known.
+
+        confusion_matrix : np.ndarray or None
+            Confusion matrix over the sorted classes in y_true, if already
+            computed.
+
+        Returns
+        -------
+        analyzer : PredictionAnalyzer
+            Analyzer over all of the given predictions. Without a
+            predictions_df, it can't be saved or viewed by dataset, and
+            only has a mean_loss if given one.
+        """
+        analyzer = cls.__new__(cls)
+        analyzer.predictions_df = None
+        analyzer.test_set = None
+        analyzer._view = None
+
+        y_true = _as_labels(np.asarray(y_true))
+        analyzer._classes = sorted(np.unique(y_true))
+        analyzer._columns = {
+            "target": y_true,
+            "max_likelihood": _as_labels(np.asarray(y_pred))}
+        analyzer._metrics = {}
+        if mean_loss is not None:
+            analyzer._metrics["mean_loss"] = float(mean_loss)
+        if confusion_matrix is not None:
+            analyzer._metrics["confusion_matrix"] = np.asarray(
+                confusion_matrix)
+
+        return analyzer
+
     @classmethod
     def from_config(cls, config, experiment_name, model_name, test_set):
         features_path = os.path.join(
@@ -79,7 +221,8 @@ class PredictionAnalyzer(object):
             config.get('experiment/predictions_format')
             .format(model_name))
 
-        features_df = pandas.read_pickle(features_path)
+        features_df = _load_datasets(features_path,
+                                     os.path.getmtime(features_path))
         if not os.path.exists(predictions_df_path):
             raise OSError("Predictions do no not yet exist for: {}"
                           .format(predictions_df_path))
@@ -98,6 +241,9 @@ class PredictionAnalyzer(object):
                 self.predictions_df["dataset"] == self.test_set]
         else:
             self._view = self.predictions_df
+        # Columns and metrics derived from the view must be recomputed.
+        self._columns = {}
+        self._metrics = {}
 
     def save(self, write_path):
         """
@@ -107,6 +253,7 @@ class PredictionAnalyzer(object):
             Serialize this class so we can reuse it later. Path should
             be a 'pkl' file.
         """
+        self._check_predictions_df("save the analysis")
         self.predictions_df.to_pickle(write_path)
 
     @classmethod
@@ -120,31 +267,65 @@ class PredictionAnalyzer(object):
         pred_df = pandas.read_pickle(read_path)
         return cls(pred_df, test_set=test_set)
 
+    def _labels(self, column):
+        """Pull a column of class indices out of the view as an array,
+        once per view."""
+        if column not in self._columns:
+            self._columns[column] = _as_labels(self._view[column].values)
+
+        return self._columns[column]
+
     @property
     def y_true(self):
-        return self._view["target"].tolist()
+        return self._labels("target")
 
     @property
     def y_pred(self):
-        return self._view["max_likelihood"].tolist()
+        return self._labels("max_likelihood")
 
     @property
     def mean_loss(self):
-        return self._view["mean_loss"].mean()
+        if "mean_loss" not in self._metrics:
+            self._check_predictions_df("compute the mean loss")
+            # Skip missing losses, as pandas' mean does; and like it, give
+            # NaN without a warning if there are none left.
+            losses = self._view["mean_loss"].values
+            losses = losses[~np.isnan(losses)]
+            self._metrics["mean_loss"] = (float(losses.mean())
+                                          if len(losses) else np.nan)
+
+        return self._metrics["mean_loss"]
 
     @property
     def accuracy(self):
-        return self.tps.sum().mean()
+        if "accuracy" not in self._metrics:
+            self._metrics["accuracy"] = float(self.tps.mean())
+
+        return self._metrics["accuracy"]
 
     @property
     def tps(self):
-        return self._view["max_likelihood"] == self._view["target"]
+        if "tps" not in self._metrics:
+            self._metrics["tps"] = self.y_true == self.y_pred
+
+        return self._metrics["tps"]
 
     @property
     def support(self):
-        # You have to be careful with bincount, because it won't
-        # count classes that don't have any data.
-        return np.bincount(self._view["target"], minlength=len(self.classes))
+        if "support" not in self._metrics:
+            # Every target lands in its row of the confusion matrix, unless
+            # it was predicted as something outside of `classes`.
+            support = self.confusion_matrix.sum(axis=1)
+            if support.sum() != len(self.y_true) and len(self.classes):
+                # Count the targets against `classes` directly; they
+                # needn't be 0..n-1.
+                true_idx, known = _label_indices(
+                    self.y_true, np.asarray(self.classes))
+                support = np.bincount(true_idx[known],
+                                      minlength=len(self.classes))
+            self._metrics["support"] = support
+
+        return self._metrics["support"]
 
     @property
     def classes(self):
@@ -155,30 +336,56 @@ class PredictionAnalyzer(object):
 
     @property
     def confusion_matrix(self):
-        return sklearn.metrics.confusion_matrix(self.y_true, self.y_pred)
+        """Confusion matrix over `classes`; computed once per view."""
+        if "confusion_matrix" not in self._metrics:
+            self._metrics["confusion_matrix"] = _confusion_matrix(
+                self.y_true, self.y_pred, self.classes)
+
+        return self._metrics["confusion_matrix"]
+
+    def _scores(self):
+        """Compute the per-class precision, recall, f1score and support
+        from the confusion matrix.
+
+        Returns
+        -------
+        precision, recall, f1score, support : np.ndarray
+            Per-class scores, ordered like `classes`. Scores which are
+            undefined (no predictions / no support) are 0, as in sklearn.
+        """
+        cm = self.confusion_matrix
+        tp = np.diag(cm)
+        support = self.support
+        precision = tp / np.maximum(cm.sum(axis=0), 1)
+        recall = tp / np.maximum(support, 1)
+        f1score = (2 * precision * recall /
+                   np.maximum(precision + recall, np.finfo(float).eps))
+        return precision, recall, f1score, support
 
     @property
     def classification_report(self):
-        return sklearn.metrics.classification_report(self.y_true, self.y_pred)
+        if "classification_report" not in self._metrics:
+            self._metrics["classification_report"] = \
+                sklearn.metrics.classification_report(
+                    self.y_true, self.y_pred)
+
+        return self._metrics["classification_report"]
 
     def class_wise_scores(self):
         """
         Return a pandas DataFrame for scores for each class,
         where the scores are the columns, and the classes are the index.
         """
-        if not self._view.empty:
-            precision = sklearn.metrics.precision_score(
-                self.y_true, self.y_pred, labels=self.classes, average=None)
-            recall = sklearn.metrics.recall_score(
-                self.y_true, self.y_pred, labels=self.classes, average=None)
-            f1score = sklearn.metrics.f1_score(
-                self.y_true, self.y_pred, labels=self.classes, average=None)
+        if len(self.y_true):
+            precision, recall, f1score, support = self._scores()
 
             return pandas.DataFrame({
                 "precision": precision,
                 "recall": recall,
                 "f1score": f1score,
-                "support": self.support})
+                "support": support},
+                index=self.classes,
+                columns=["precision", "recall", "f1score", "support"])
         else:
             return pandas.DataFrame(columns=[
                 "precision", "recall", "f1score", "support"])
@@ -194,14 +401,15 @@ class PredictionAnalyzer(object):
 
     def summary_scores(self):
         """Return summary scores over the entire dataset."""
-        accuracy = sklearn.metrics.accuracy_score(
-            self.y_true, self.y_pred)
-        precision = sklearn.metrics.precision_score(
-            self.y_true, self.y_pred, labels=self.classes, average="weighted")
-        recall = sklearn.metrics.recall_score(
-            self.y_true, self.y_pred, labels=self.classes, average="weighted")
-        f1score = sklearn.metrics.f1_score(
-            self.y_true, self.y_pred, labels=self.classes, average="weighted")
+        precision, recall, f1score, support = self._scores()
+        n_samples = support.sum()
+        # Every correct prediction lands on the diagonal.
+        accuracy = (np.trace(self.confusion_matrix) / n_samples
+                    if n_samples else np.nan)
+        # Weighted by support, as sklearn's average="weighted".
+        weights = support / max(n_samples, 1)
+        precision, recall, f1score = [
+            np.dot(weights, x) for x in (precision, recall, f1score)]
         return pandas.Series([accuracy, precision, recall, f1score],
                              index=["accuracy", "precision",
                                     "recall", "f1score"])
@@ -4,10 +4,12 @@ import pandas
 import progressbar
 
 import hcnn.common.labels as labels
-instrument_map = labels.InstrumentClassMap()
+instrument_map = labels.get_class_map()
 
 logger = logging.getLogger(__name__)
 
+RESULT_COLUMNS = ['loss', "y_pred", "y_true"]
+
 
 def predict_one(dfrecord, model, slicer_fx, t_len):
     """Return an evaluation object/dict after evaluating
@@ -35,6 +37,15 @@ def predict_one(dfrecord, model, slicer_fx, t_len):
     results : pandas.Series
         All the results stored as a pandas.Series
     """
+    return pandas.Series(
+        data=_predict_values(dfrecord, model, slicer_fx, t_len),
+        index=RESULT_COLUMNS,
+        name=dfrecord.name)
+
+
+def _predict_values(dfrecord, model, slicer_fx, t_len):
+    """Run predict_one for a record, returning the results as a list
+    ordered like RESULT_COLUMNS."""
     # Get predictions for every timestep in the file.
     target = instrument_map.get_index(dfrecord["instrument"])
 
@@ -52,11 +63,7 @@ def predict_one(dfrecord, model, slicer_fx, t_len):
     y_pred = predictions[0] if len(predictions) else None
     loss = losses[0] if len(losses) else None
 
-    # Return both of these as a dataframe.
-    return pandas.Series(
-        data=[loss, y_pred, target],
-        index=['loss', "y_pred", "y_true"],
-        name=dfrecord.name)
+    return [loss, y_pred, target]
 
 
 def predict_many(test_df, model, slicer_fx, t_len, show_progress=False):
@@ -85,6 +92,8 @@ def predict_many(test_df, model, slicer_fx, t_len, show_progress=False):
             * vote
             * target
     """
+    # Collect plain rows and build the DataFrame once at the end, rather
+    # than one Series per file.
     results = []
     if show_progress:
         i = 0
@@ -92,7 +101,8 @@ def predict_many(test_df, model, slicer_fx, t_len, show_progress=False):
 
     try:
         for index, row in test_df.iterrows():
-            results += [predict_one(row, model, slicer_fx, t_len)]
+            results.append(
+                (index, _predict_values(row, model, slicer_fx, t_len)))
 
             if show_progress:
                 progress.update(i)
@@ -103,4 +113,6 @@ def predict_many(test_df, model, slicer_fx, t_len, show_progress=False):
         logger.error("Recommend you start this process over to evaluate "
                      "them all.")
 
-    return pandas.DataFrame(results)
+    return pandas.DataFrame([values for _, values in results],
+                            index=[index for index, _ in results],
+                            columns=RESULT_COLUMNS)
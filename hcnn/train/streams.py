@@ -8,6 +8,8 @@ import logging
 import numpy as np
 import os
 import pescador
+import queue
+import threading
 import zipfile
 
 import hcnn.common.utils as utils
@@ -15,7 +17,7 @@ import hcnn.common.labels as labels
 
 logger = logging.getLogger(__name__)
 
-instrument_map = labels.InstrumentClassMap()
+instrument_map = labels.get_class_map()
 
 
 def base_slicer(record, t_len, obs_slicer, shuffle=True, auto_restart=True,
@@ -103,7 +105,9 @@ def base_slicer(record, t_len, obs_slicer, shuffle=True, auto_restart=True,
         if slice_logger: slice_logger.error(record)
         return
 
-    # Take the logmagnitude of the cqt
+    # Take the logmagnitude of the cqt. Features may be stored at half
+    # precision, which would underflow when squared.
+    cqt = cqt.astype(np.float32, copy=False)
     cqt = librosa.logamplitude(cqt ** 2, ref_power=np.max)
 
     # Make sure the data is long enough.
@@ -346,6 +350,64 @@ def zmq_buffered_stream(stream, batch_size):
     return pescador.zmq_stream(stream, max_batches=batch_size)
 
 
+def prefetch_stream(stream, n_batches=2):
+    """Pull items from stream in a background thread, so the next batches
+    are being sliced while the current one is being used.
+
+    Parameters
+    ----------
+    stream : iterable
+        Any iterable, e.g. an InstrumentStreamer.
+
+    n_batches : int
+        Maximum number of items to read ahead.
+
+    Yields
+    ------
+    item
+        The items of stream, in order.
+    """
+    finished = object()
+    items = queue.Queue(maxsize=n_batches)
+    stop = threading.Event()
+
+    def put(item):
+        # Keep checking if we've been abandoned, so the thread can't block
+        # forever on a full queue.
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def worker():
+        try:
+            for item in stream:
+                if not put((None, item)):
+                    return
+        except Exception as e:
+            put((e, None))
+        else:
+            put((None, finished))
+
+    thread = threading.Thread(target=worker)
+    thread.daemon = True
+    thread.start()
+
+    try:
+        while True:
+            error, item = items.get()
+            if error is not None:
+                raise error
+            if item is finished:
+                break
+            yield item
+    finally:
+        stop.set()
+
+
 class InstrumentStreamer(collections.Iterator):
     """Class wrapping the creation of a pescador streamer
     to sample equally from each instrument class available in
@@ -2,6 +2,8 @@ import numpy as np
 import os
 import pandas
 import pytest
+import sklearn.metrics
+import warnings
 
 import hcnn.evaluate.analyze as analyze
 
@@ -46,19 +48,112 @@ def test_save_load_analyzer(workspace, testdata_df):
 
     # Prove you can load it back in, too.
     analyzer2 = analyze.PredictionAnalyzer.load(save_path, test_set)
-    assert analyzer.y_true == analyzer2.y_true
-    assert analyzer.y_pred == analyzer2.y_pred
+    np.testing.assert_array_equal(analyzer.y_true, analyzer2.y_true)
+    np.testing.assert_array_equal(analyzer.y_pred, analyzer2.y_pred)
 
 
 def test_metrics(testdata_df):
     analyzer = analyze.PredictionAnalyzer(testdata_df)
-    assert analyzer.y_true == testdata_df["target"].tolist()
-    assert analyzer.y_pred == testdata_df["max_likelihood"].tolist()
+    np.testing.assert_array_equal(analyzer.y_true, testdata_df["target"])
+    np.testing.assert_array_equal(analyzer.y_pred,
+                                  testdata_df["max_likelihood"])
     assert isinstance(analyzer.mean_loss, float)
     assert np.sum(analyzer.support) == len(testdata_df)
     assert len(analyzer.tps) == len(testdata_df)
 
 
+def test_confusion_matrix(testdata_df):
+    analyzer = analyze.PredictionAnalyzer(testdata_df)
+    expected = sklearn.metrics.confusion_matrix(
+        testdata_df["target"], testdata_df["max_likelihood"],
+        labels=analyzer.classes)
+    np.testing.assert_array_equal(analyzer.confusion_matrix, expected)
+
+    # Predictions outside of the known classes aren't counted.
+    unknown_df = testdata_df.assign(
+        max_likelihood=testdata_df["max_likelihood"] + 100)
+    analyzer = analyze.PredictionAnalyzer(unknown_df)
+    assert analyzer.confusion_matrix.sum() == 0
+    assert np.sum(analyzer.support) == len(testdata_df)
+
+
+def test_from_arrays(workspace, testdata, testdata_df):
+    y_true, y_pred, mean_loss, _ = testdata
+    expected = analyze.PredictionAnalyzer(testdata_df)
+    analyzer = analyze.PredictionAnalyzer.from_arrays(
+        y_true, y_pred, mean_loss=mean_loss.mean())
+    np.testing.assert_array_equal(analyzer.confusion_matrix,
+                                  expected.confusion_matrix)
+    np.testing.assert_almost_equal(analyzer.mean_loss, expected.mean_loss)
+    np.testing.assert_array_almost_equal(analyzer.summary_scores(),
+                                         expected.summary_scores())
+
+    analyzer = analyze.PredictionAnalyzer.from_arrays(
+        y_true, y_pred, confusion_matrix=expected.confusion_matrix)
+    assert analyzer.confusion_matrix is expected.confusion_matrix
+    with pytest.raises(ValueError):
+        analyzer.view("rwc")
+    with pytest.raises(ValueError):
+        analyzer.mean_loss
+    with pytest.raises(ValueError):
+        analyzer.save(os.path.join(workspace, "analyzer.pkl"))
+
+
+def test_noncontiguous_classes():
+    # A fold without any class 3 targets, where the model predicts 3.
+    predictions_df = pandas.DataFrame({
+        "target": [0, 1, 2, 4, 4, 0, 1, 2],
+        "max_likelihood": [0, 3, 2, 4, 3, 0, 1, 1],
+        "mean_loss": np.random.random(8)})
+    analyzer = analyze.PredictionAnalyzer(predictions_df)
+    assert analyzer.classes == [0, 1, 2, 4]
+    np.testing.assert_array_equal(analyzer.support, [2, 2, 2, 2])
+
+    scores = analyzer.class_wise_scores()
+    assert list(scores.index) == [0, 1, 2, 4]
+    assert all(np.isfinite(scores))
+    assert all(np.isfinite(analyzer.summary_scores()))
+
+
+def test_scores_match_sklearn():
+    # Nothing is ever predicted as class 2, and 7 isn't a target class.
+    predictions_df = pandas.DataFrame({
+        "target": [0, 0, 1, 1, 2, 2, 3, 3, 3, 0],
+        "max_likelihood": [0, 1, 1, 1, 0, 7, 3, 0, 7, 0],
+        "mean_loss": np.random.random(10)})
+    analyzer = analyze.PredictionAnalyzer(predictions_df)
+    y_true = predictions_df["target"]
+    y_pred = predictions_df["max_likelihood"]
+
+    precision, recall, f1score, support = \
+        sklearn.metrics.precision_recall_fscore_support(
+            y_true, y_pred, labels=analyzer.classes, average=None)
+    scores = analyzer.class_wise_scores()
+    np.testing.assert_array_almost_equal(scores["precision"], precision)
+    np.testing.assert_array_almost_equal(scores["recall"], recall)
+    np.testing.assert_array_almost_equal(scores["f1score"], f1score)
+    np.testing.assert_array_equal(scores["support"], support)
+
+    precision, recall, f1score, _ = \
+        sklearn.metrics.precision_recall_fscore_support(
+            y_true, y_pred, labels=analyzer.classes, average="weighted")
+    summary = analyzer.summary_scores()
+    np.testing.assert_almost_equal(
+        summary["accuracy"], sklearn.metrics.accuracy_score(y_true, y_pred))
+    np.testing.assert_almost_equal(summary["precision"], precision)
+    np.testing.assert_almost_equal(summary["recall"], recall)
+    np.testing.assert_almost_equal(summary["f1score"], f1score)
+
+
+def test_mean_loss_empty(testdata_df):
+    no_losses = testdata_df.assign(mean_loss=np.nan)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        assert np.isnan(analyze.PredictionAnalyzer(no_losses).mean_loss)
+        assert np.isnan(
+            analyze.PredictionAnalyzer(testdata_df.iloc[:0]).mean_loss)
+
+
 def test_class_wise_scores(testdata_df):
     analyzer = analyze.PredictionAnalyzer(testdata_df, test_set="rwc")
     scores = analyzer.class_wise_scores()
@@ -1,5 +1,7 @@
 import pytest
 
+import hcnn.common.labels
+
 
 def test_load_classmap(classmap):
     assert classmap is not None
@@ -35,3 +37,24 @@ def test_classmap_indeces_match(classmap):
     for i in range(classmap.size):
         classname = classmap.from_index(i)
         assert classmap.get_index(classname) == i
+
+
+def test_classmap_contains(classmap):
+    assert "bassoon" in classmap
+    assert "acoustic-guitar" in classmap
+    assert "not-an-instrument" not in classmap
+    assert all(x in classmap for x in classmap.allnames)
+
+
+def test_classmap_names_are_copies(classmap):
+    classmap.classnames.append("kazoo")
+    classmap.allnames.sort(reverse=True)
+    assert len(classmap.classnames) == 12
+    assert classmap.allnames == sorted(classmap.allnames)
+    assert classmap.from_index(11) == "violin"
+
+
+def test_get_class_map():
+    classmap = hcnn.common.labels.get_class_map()
+    assert isinstance(classmap, hcnn.common.labels.InstrumentClassMap)
+    assert classmap is hcnn.common.labels.get_class_map()
@@ -1,6 +1,7 @@
 import numpy as np
 import os
 import pytest
+import zipfile
 
 import hcnn.common.utils as utils
 
@@ -16,6 +17,22 @@ def test_create_directory(workspace):
     assert utils.create_directory(dname)
 
 
+def test_unzip_files(workspace):
+    zip_paths = []
+    for name in ["one", "two"]:
+        zip_path = os.path.join(workspace, "{}.zip".format(name))
+        with zipfile.ZipFile(zip_path, 'w') as myzip:
+            myzip.writestr("{}.txt".format(name), name)
+        zip_paths.append(zip_path)
+
+    result = utils.unzip_files(zip_paths)
+    assert result == [os.path.join(workspace, x) for x in ["one", "two"]]
+    assert os.path.exists(os.path.join(workspace, "two", "two.txt"))
+
+    # Already extracted, so these get skipped.
+    assert utils.unzip_files(zip_paths) == []
+
+
 def test_filebase():
     fnames = ['y', 'y.z', 'x/y.z', 'x.y.z']
     results = ['y', 'y', 'y', 'x.y']
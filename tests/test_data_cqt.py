@@ -1,4 +1,5 @@
 import claudio
+import librosa
 import os
 import pytest
 import numpy as np
@@ -37,6 +38,26 @@ def test_cqt_one(workspace):
         assert key in features
 
 
+def test_cqt_one_partial_params(workspace):
+    # harmonic_cqt's defaults differ from librosa's for the parameters left
+    # out here, so the plain CQT can't be reused as the first harmonic.
+    input_file = os.path.join(DIRNAME, "sax_cres.mp3")
+    output_file = os.path.join(workspace, "partial.npz")
+    cqt_params = dict(hop_length=1024, fmin=32.7, n_bins=72,
+                      bins_per_octave=24)
+    harmonic_params = dict(n_harmonics=2, fmin=32.7, n_bins=72,
+                           bins_per_octave=24)
+    assert CQT.cqt_one(input_file, output_file, cqt_params=dict(cqt_params),
+                       harmonic_params=harmonic_params)
+
+    x, fs = claudio.read(input_file, **CQT.AUDIO_PARAMS)
+    cqt_params.update(**harmonic_params)
+    expected = CQT.harmonic_cqt(x, fs, fundamental=None, **cqt_params)
+    features = np.load(output_file)
+    np.testing.assert_allclose(features['harmonic_cqt'], np.abs(expected),
+                               rtol=1e-2, atol=1e-4)
+
+
 def test_download_many(workspace):
     input_files = [os.path.join(DIRNAME, fname)
                    for fname in ("sax_cres.mp3", "mandolin_trem.mp3")]
@@ -44,3 +65,53 @@ def test_download_many(workspace):
                     for fname in ('foo.npz', 'bar.npz')]
     # cqt_many returns files that failed; should be none.
     assert not CQT.cqt_many(input_files, output_files)
+
+
+def test_memoize_filters():
+    calls = []
+
+    def constant_q(sr, fmin=None, n_bins=84):
+        calls.append((sr, fmin, n_bins))
+        return np.ones((n_bins, 4)), np.arange(n_bins)
+
+    cached = CQT.memoize_filters(constant_q)
+    filters, lengths = cached(22050, fmin=20.0, n_bins=12)
+    # Modifying the result in place shouldn't change the cached value.
+    filters *= 2
+    filters, lengths = cached(22050, fmin=20.0, n_bins=12)
+    assert np.all(filters == 1)
+    assert len(calls) == 1
+
+    cached(22050, fmin=40.0, n_bins=12)
+    assert len(calls) == 2
+
+
+def test_memoize_filters_unhashable():
+    calls = []
+
+    def constant_q(sr, window=None):
+        calls.append(sr)
+        return np.ones((1, 4)), np.arange(1)
+
+    cached = CQT.memoize_filters(constant_q)
+    cached(22050, window=[1, 2])
+    cached(22050, window=[1, 2])
+    assert len(calls) == 2
+
+
+def test_cached_filters():
+    x = np.random.random((22050, 1)) - 0.5
+    original = librosa.filters.constant_q
+    kwargs = dict(sr=22050, hop_length=512, fmin=55.0, n_bins=24,
+                  bins_per_octave=12)
+    CQT._cqt_channels(x, **kwargs)
+    hits = CQT._cached_constant_q.cache_info().hits
+    spec = CQT._cqt_channels(x, **kwargs)
+
+    # The second CQT used the cached filters...
+    assert CQT._cached_constant_q.cache_info().hits > hits
+    np.testing.assert_array_almost_equal(
+        np.abs(spec[0]), np.abs(librosa.cqt(x[:, 0], **kwargs).T),
+        decimal=4)
+    # ...and librosa was left as it was.
+    assert librosa.filters.constant_q is original
@@ -72,6 +72,26 @@ def example_obs(example_data):
 #     assert all([isinstance(x, dict) for x in newds.to_builtin()])
 
 
+def test_observation_schema_validator(example_data):
+    class StrictObservation(dataset.Observation):
+        SCHEMA = {"type": "object", "required": ["not-a-field"]}
+
+    obs = dataset.Observation(**example_data[0])
+    assert obs.schema_validator().is_valid(obs.to_dict())
+    strict = StrictObservation(**example_data[0])
+    assert not strict.schema_validator().is_valid(strict.to_dict())
+    # The parent's validator is unaffected by compiling the subclass's.
+    assert obs.schema_validator().is_valid(obs.to_dict())
+
+    original = dataset.Observation.SCHEMA
+    try:
+        dataset.Observation.SCHEMA = StrictObservation.SCHEMA
+        assert not obs.schema_validator().is_valid(obs.to_dict())
+    finally:
+        dataset.Observation.SCHEMA = original
+    assert obs.schema_validator().is_valid(obs.to_dict())
+
+
 def test_dataset_from_observations(example_obs):
     ds = dataset.Dataset.from_observations(example_obs)
     assert ds is not None and isinstance(ds, dataset.Dataset)
@@ -185,3 +185,19 @@ def test_instrument_streamer_with_zmq(tiny_feats):
             df, streams.cqt_slices,
             t_len=t_len, batch_size=batch_size, use_zmq=True)
         __test_streamer(streamer, t_len, batch_size)
+
+
+def test_prefetch_stream():
+    assert list(streams.prefetch_stream(range(10))) == list(range(10))
+    assert list(streams.prefetch_stream([], n_batches=1)) == []
+
+
+def test_prefetch_stream_raises():
+    def broken_stream():
+        yield 1
+        raise ValueError("bad stream")
+
+    prefetched = streams.prefetch_stream(broken_stream())
+    assert next(prefetched) == 1
+    with pytest.raises(ValueError):
+        next(prefetched)